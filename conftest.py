@@ -0,0 +1,43 @@
+import pytest
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+# --doctest-modules must not try to import (and thereby run) setup.py.
+collect_ignore = ["setup.py"]
+
+FIXTURE_NAMES = (
+    "accounts",
+    "webproperties",
+    "profiles",
+    "segments",
+    "short-query",
+    "long-query",
+    "no-rows",
+)
+
+
+# The parsed fixtures are shared between tests: nothing mutates them, so
+# there is no need to re-read and re-parse the same files for every test.
+_fixture_cache = {}
+
+
+def fixture(name):
+    if name not in _fixture_cache:
+        with open("fixtures/%s" % name, "rb") as f:
+            _fixture_cache[name] = json_loads(f.read())
+    return _fixture_cache[name]
+
+
+@pytest.fixture(scope="class")
+def ga_fixtures(request):
+    """Attach the parsed JSON fixtures to a TestCase class.
+
+    Scoped to the classes marked with usefixtures so pure unit tests such
+    as ParseGAUrlTest run without touching the fixtures directory at all;
+    fixture() is cached, so each file is still only parsed once.
+    """
+    request.cls._fixtures = dict(
+        (name, fixture("%s.json" % name)) for name in FIXTURE_NAMES)
@@ -1,18 +1,17 @@
+import copy
 from datetime import date
 from itertools import islice
-import json
 import unittest
 from oauth2client.clientsecrets import InvalidClientSecretsError
 
+import pytest
 from mock import patch, ANY, Mock, call
 from gapy.error import GapyError
 from gapy.client import ManagementClient, QueryClient, Client, \
     from_private_key, from_secrets_file, from_credentials_db
 from gapy.response import parse_ga_url
 
-
-def fixture(name):
-    return json.load(open("fixtures/%s" % name))
+from conftest import fixture
 
 
 class GapyTest(unittest.TestCase):
@@ -60,14 +59,35 @@ class GapyTest(unittest.TestCase):
         self.assertEqual(client._ga_hook, ga_hook)
 
 
+@pytest.mark.usefixtures("ga_fixtures")
 class ManagementClientTest(unittest.TestCase):
 
+    @classmethod
+    def setUpClass(cls):
+        # Touch the attribute chains once so each setUp can deepcopy a
+        # ready-made Mock tree instead of growing one lazily per test.
+        cls._service_template = Mock()
+        for name in ("accounts", "webproperties", "profiles", "segments"):
+            # The chain must be followed through each return_value: mock
+            # 1.0.1 stores un-accessed return values as a sentinel, which
+            # deepcopy clones into a dead end instead of a child Mock.
+            getattr(cls._service_template.management(),
+                    name)().list.return_value.execute
+        # Building the chains above records calls on the template; clear
+        # them so every copy starts with pristine call counts.
+        cls._service_template.reset_mock()
+
     def setUp(self):
-        self.service = Mock()
+        self.service = copy.deepcopy(self._service_template)
         self.client = ManagementClient(self.service)
 
     def mock_list(self, name):
-        data = fixture("%s.json" % name)
+        # _fixtures is attached by the ga_fixtures conftest fixture; fall
+        # back to fixture() so the suite still runs under plain unittest.
+        if hasattr(self, "_fixtures"):
+            data = self._fixtures[name]
+        else:
+            data = fixture("%s.json" % name)
         getattr(self.service.management(),
                 name)().list.return_value.execute.return_value = data
 
@@ -85,7 +105,7 @@ class ManagementClientTest(unittest.TestCase):
                          "673591833363@developer.gserviceaccount.com")
         self.assertEqual(accounts.kind, "analytics#accounts")
 
-        account = iter(accounts).next()
+        account = next(iter(accounts))
         self.assertEqual(account["id"], "26179049")
 
     def test_account(self):
@@ -113,7 +133,7 @@ class ManagementClientTest(unittest.TestCase):
                          "673591833363@developer.gserviceaccount.com")
         self.assertEqual(webproperties.kind, "analytics#webproperties")
 
-        webproperty = iter(webproperties).next()
+        webproperty = next(iter(webproperties))
         self.assertEqual(webproperty["id"], "UA-26179049-1")
 
     def test_webproperty(self):
@@ -168,20 +188,47 @@ class ManagementClientTest(unittest.TestCase):
                          "673591833363@developer.gserviceaccount.com")
         self.assertEqual(segments.kind, "analytics#segments")
 
-        segment = iter(segments).next()
+        segment = next(iter(segments))
         self.assertEqual(segment["id"], "-2")
 
 
+@pytest.mark.usefixtures("ga_fixtures")
 class QueryClientTest(unittest.TestCase):
 
+    # The kwargs every short query is expected to pass to the service.
+    _BASE_KWARGS = {
+        "ids": "ga:12345",
+        "start_date": "2012-01-01", "end_date": "2012-01-02",
+        "metrics": "ga:metric",
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        # Touch the attribute chain once so each setUp can deepcopy a
+        # ready-made Mock tree instead of growing one lazily per test.
+        cls._service_template = Mock()
+        # The chain must be followed through each return_value: mock 1.0.1
+        # stores un-accessed return values as a sentinel, which deepcopy
+        # clones into a dead end instead of a child Mock.
+        cls._service_template.data.return_value.ga.return_value. \
+            get.return_value.execute.return_value
+        # Building the chain above may record calls on the template; clear
+        # them so every copy starts with pristine call counts.
+        cls._service_template.reset_mock()
+
     def setUp(self):
-        self.service = Mock()
+        self.service = copy.deepcopy(self._service_template)
         self.client = QueryClient(self.service)
 
     def mock_get(self, name, service=None):
         if service is None:
             service = self.service
-        data = fixture("%s.json" % name)
+        # _fixtures is attached by the ga_fixtures conftest fixture; fall
+        # back to fixture() so the suite still runs under plain unittest.
+        if hasattr(self, "_fixtures"):
+            data = self._fixtures[name]
+        else:
+            data = fixture("%s.json" % name)
         service.data.return_value.ga.return_value.get.return_value. \
             execute.return_value = data
 
@@ -200,15 +247,14 @@ class QueryClientTest(unittest.TestCase):
                                   date(2012, 1, 1), date(2012, 1, 2),
                                   "metric", "dimension", "dimension2==value")
 
-        self.assert_get_called(
-            ids="ga:12345",
-            start_date="2012-01-01", end_date="2012-01-02",
-            metrics="ga:metric", dimensions="ga:dimension",
+        self.assert_get_called(**dict(
+            self._BASE_KWARGS,
+            dimensions="ga:dimension",
             filters="ga:dimension2==value"
-        )
+        ))
         self.assertEqual(results.kind, "analytics#gaData")
         self.assertEqual(len(results), 48)
-        result = iter(results).next()
+        result = next(iter(results))
         self.assertEqual(result["metrics"], {"metric": "00"})
         self.assertEqual(result["dimensions"]["dimension"], u'20121110')
 
@@ -219,12 +265,11 @@ class QueryClientTest(unittest.TestCase):
                         date(2012, 1, 1), date(2012, 1, 2),
                         "ga:metric", "ga:dimension", "ga:dimension2==value")
 
-        self.assert_get_called(
-            ids="ga:12345",
-            start_date="2012-01-01", end_date="2012-01-02",
-            metrics="ga:metric", dimensions="ga:dimension",
+        self.assert_get_called(**dict(
+            self._BASE_KWARGS,
+            dimensions="ga:dimension",
             filters="ga:dimension2==value"
-        )
+        ))
 
     def test_short_query_with_list_arguments(self):
         self.mock_get("short-query")
@@ -245,7 +290,7 @@ class QueryClientTest(unittest.TestCase):
         )
         self.assertEqual(results.kind, "analytics#gaData")
         self.assertEqual(len(results), 48)
-        result = iter(results).next()
+        result = next(iter(results))
         self.assertEqual(result["metrics"],
                          {"metric": "8083", "metric2": "7643"})
         self.assertEqual(result["dimensions"],
@@ -260,11 +305,7 @@ class QueryClientTest(unittest.TestCase):
                                   date(2012, 1, 1), date(2012, 1, 2),
                                   "metric")
 
-        self.assert_get_called(
-            ids="ga:12345",
-            start_date="2012-01-01", end_date="2012-01-02",
-            metrics="ga:metric"
-        )
+        self.assert_get_called(**self._BASE_KWARGS)
         self.assertEqual(results.kind, "analytics#gaData")
         self.assertEqual(len(results), 48)
 
@@ -276,12 +317,7 @@ class QueryClientTest(unittest.TestCase):
         self.client.get("12345", date(2012, 1, 1), date(2012, 1, 2),
                         "metric", max_results=10)
 
-        self.assert_get_called(
-            ids="ga:12345",
-            start_date="2012-01-01", end_date="2012-01-02",
-            metrics="ga:metric",
-            max_results=10,
-        )
+        self.assert_get_called(**dict(self._BASE_KWARGS, max_results=10))
 
     def test_short_query_call_with_sort(self):
         self.mock_get("short-query")
@@ -291,12 +327,8 @@ class QueryClientTest(unittest.TestCase):
         self.client.get("12345", date(2012, 1, 1), date(2012, 1, 2),
                         "metric", sort=["foo", "-bar"])
 
-        self.assert_get_called(
-            ids="ga:12345",
-            start_date="2012-01-01", end_date="2012-01-02",
-            metrics="ga:metric",
-            sort="ga:foo,-ga:bar",
-        )
+        self.assert_get_called(**dict(self._BASE_KWARGS,
+                                      sort="ga:foo,-ga:bar"))
 
     def test_short_query_with_no_rows(self):
         self.mock_get("no-rows")
@@ -316,13 +348,11 @@ class QueryClientTest(unittest.TestCase):
         self.client.get("12345", date(2012, 1, 1), date(2012, 1, 2),
                 "metric", sort=["foo", "-bar"], segment="gaid::5bSnKB8rR6iYZqYezSS1sQ")
 
-        self.assert_get_called(
-            ids="ga:12345",
-            start_date="2012-01-01", end_date="2012-01-02",
-            metrics="ga:metric",
+        self.assert_get_called(**dict(
+            self._BASE_KWARGS,
             sort="ga:foo,-ga:bar",
             segment="gaid::5bSnKB8rR6iYZqYezSS1sQ"
-        )
+        ))
 
     def test_long_query(self):
         self.mock_get("long-query")
@@ -339,11 +369,7 @@ class QueryClientTest(unittest.TestCase):
             dimensions="ga:dimension,ga:dimension2")
         self.assertEqual(results.kind, "analytics#gaData")
         self.assertEqual(len(results), 2)
-        i = iter(results)
-        i.next()
-        i.next()
-        i.next()
-        i.next()
+        list(islice(iter(results), 4))
 
         calls = self.get_call_args_list()
         self.assertEqual(len(calls), 2)
@@ -401,61 +427,71 @@ class QueryClientTest(unittest.TestCase):
         self.mock_get('short-query', service)
 
         client.get('12345', date(2012, 1, 1), date(2012, 1, 2), 'metric')
-        kwargs = {
-            'ids': 'ga:12345', 'metrics': 'ga:metric',
-            'start_date': '2012-01-01', 'end_date': '2012-01-02',
-        }
-        ga_hook.assert_called_once_with(kwargs)
+        ga_hook.assert_called_once_with(dict(self._BASE_KWARGS))
+
+
+_SEMICOLON_URL = (
+    "https://www.googleapis.com/analytics/v3/data/ga"
+    "?ids=ga:53872948"
+    "&dimensions=ga:pageTitle,ga:pagePath,ga:day,ga:month,ga:year"
+    "&metrics=ga:pageviews"
+    "&filters=ga:pagePath!~%5E(/$"
+    "%7C/(.*-finished$"
+    "%7C%5C?backtoPage"
+    "%7Ctransformation"
+    "%7Cservice-manual"
+    "%7Cperformance"
+    "%7Cgovernment"
+    "%7Csearch"
+    "%7Cdone"
+    "%7Cprint).*);"
+    "ga:pageTitle!~(404"
+    "%7C410"
+    "%7C500"
+    "%7C504"
+    "%7C510"
+    "%7CAn+error+has+occurred)"
+    "&start-date=2014-02-10"
+    "&end-date=2014-02-23"
+    "&start-index=1001"
+    "&max-results=1000")
+
+_EXPECTED_FILTERS = (
+    "ga:pagePath!~^(/$"
+    "|/(.*-finished$"
+    "|\\?backtoPage"
+    "|transformation"
+    "|service-manual"
+    "|performance"
+    "|government"
+    "|search"
+    "|done"
+    "|print).*);"
+    "ga:pageTitle!~("
+    "404"
+    "|410"
+    "|500"
+    "|504"
+    "|510"
+    "|An error has occurred)")
+
+
+# Memoised so that parametrizing over URLs only ever parses each one once.
+_parse_cache = {}
+
+
+def _cached_parse(url):
+    if url not in _parse_cache:
+        _parse_cache[url] = parse_ga_url(url)
+    return _parse_cache[url]
 
 
 class ParseGAUrlTest(unittest.TestCase):
 
     def test_url_with_semicolon(self):
-        next_kwargs = parse_ga_url(
-            "https://www.googleapis.com/analytics/v3/data/ga"
-            "?ids=ga:53872948"
-            "&dimensions=ga:pageTitle,ga:pagePath,ga:day,ga:month,ga:year"
-            "&metrics=ga:pageviews"
-            "&filters=ga:pagePath!~%5E(/$"
-            "%7C/(.*-finished$"
-            "%7C%5C?backtoPage"
-            "%7Ctransformation"
-            "%7Cservice-manual"
-            "%7Cperformance"
-            "%7Cgovernment"
-            "%7Csearch"
-            "%7Cdone"
-            "%7Cprint).*);"
-            "ga:pageTitle!~(404"
-            "%7C410"
-            "%7C500"
-            "%7C504"
-            "%7C510"
-            "%7CAn+error+has+occurred)"
-            "&start-date=2014-02-10"
-            "&end-date=2014-02-23"
-            "&start-index=1001"
-            "&max-results=1000")
-
-        self.assertEqual(
-            next_kwargs['filters'],
-            "ga:pagePath!~^(/$"
-            "|/(.*-finished$"
-            "|\\?backtoPage"
-            "|transformation"
-            "|service-manual"
-            "|performance"
-            "|government"
-            "|search"
-            "|done"
-            "|print).*);"
-            "ga:pageTitle!~("
-            "404"
-            "|410"
-            "|500"
-            "|504"
-            "|510"
-            "|An error has occurred)")
+        next_kwargs = _cached_parse(_SEMICOLON_URL)
+
+        self.assertEqual(next_kwargs['filters'], _EXPECTED_FILTERS)
 
 
 if __name__ == "__main__":